@@ -3,15 +3,40 @@ Data loading utilities for evaluation data.
 """
 import json
 import os
-import glob
-from typing import List, Dict, Any, Optional, Iterator, TypeVar, Generic, Type
-from dataclasses import dataclass
+import fnmatch
+import hashlib
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, Tuple, TypeVar, Generic, Type
+from dataclasses import dataclass, fields
 from abc import ABC, abstractmethod
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
-@dataclass
+def load_json_bytes(raw: bytes) -> Any:
+    """Parse JSON bytes with orjson when available, falling back to the stdlib parser."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson only accepts UTF-8; let the stdlib handle other encodings
+            pass
+    return json.loads(raw)
+
+def dump_json_str(obj: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string with orjson when available, matching json.dumps(indent=2) output."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False)
+
+@dataclass(slots=True)
 class BaseEvalDataPoint(ABC):
     """Base class for evaluation data points."""
     filename: str
@@ -23,6 +48,11 @@ class BaseEvalDataPoint(ABC):
     def from_dict(cls, data: Dict[str, Any]) -> 'BaseEvalDataPoint':
         """Create data point from dictionary. Must be implemented by subclasses."""
         pass
+    
+    @classmethod
+    def from_json(cls, raw: bytes) -> 'BaseEvalDataPoint':
+        """Create data point from raw JSON bytes. Subclasses may decode directly."""
+        return cls.from_dict(load_json_bytes(raw))
 
 # Type variable for generic data point types
 DataPointType = TypeVar('DataPointType', bound=BaseEvalDataPoint)
@@ -30,51 +60,126 @@ DataPointType = TypeVar('DataPointType', bound=BaseEvalDataPoint)
 class BaseDataLoader(ABC, Generic[DataPointType]):
     """Base class for loading and managing evaluation data."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", use_cache: bool = True):
         """Initialize data loader with data directory."""
         self.data_dir = data_dir
+        # Parsed data points are pickled here, keyed on each file's mtime and size
+        self.use_cache = use_cache
+        self.cache_dir = os.path.join(data_dir, ".cache")
     
     @abstractmethod
     def get_data_point_class(self) -> Type[DataPointType]:
         """Return the data point class this loader uses."""
         pass
         
+    def _build_data_point(self, raw: bytes, filepath: str) -> DataPointType:
+        """Construct a data point from the raw file contents."""
+        data_point_class = self.get_data_point_class()
+        data_point = data_point_class.from_json(raw)
+        data_point.filename = os.path.basename(filepath)
+        return data_point
+        
+    def _cache_key(self, filepath: str) -> Tuple[int, int, Tuple[str, ...]]:
+        """Cache validity key: file mtime and size, plus the data point fields."""
+        st = os.stat(filepath)
+        field_names = tuple(f.name for f in fields(self.get_data_point_class()))
+        return (st.st_mtime_ns, st.st_size, field_names)
+    
+    def _cache_path(self, filepath: str) -> str:
+        """Path of the pickle cache entry for a data file."""
+        digest = hashlib.md5(os.path.abspath(filepath).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+    
+    def _read_cache(self, filepath: str, key: Tuple) -> Optional[DataPointType]:
+        """Return the cached data point for a file if it is still valid."""
+        try:
+            with open(self._cache_path(filepath), 'rb') as f:
+                cached_key, data_point = pickle.load(f)
+        except Exception:
+            return None
+        return data_point if cached_key == key else None
+    
+    def _write_cache(self, filepath: str, key: Tuple, data_point: DataPointType):
+        """Store a parsed data point, replacing the entry atomically."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                pickle.dump((key, data_point), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, self._cache_path(filepath))
+        except Exception as e:
+            logger.warning(f"Failed to cache {filepath}: {e}")
+    
+    def _load_data_point(self, filepath: str) -> DataPointType:
+        """
+        Load one data point, reusing the on-disk cache when the file is unchanged.
+        
+        Files are decoded in one step through the data point's from_json.
+        """
+        # Stat before reading so a concurrent edit can only make the entry look stale
+        key = self._cache_key(filepath) if self.use_cache else None
+        if key is not None:
+            data_point = self._read_cache(filepath, key)
+            if data_point is not None:
+                return data_point
+        
+        with open(filepath, 'rb') as f:
+            data_point = self._build_data_point(f.read(), filepath)
+        if key is not None:
+            self._write_cache(filepath, key, data_point)
+        return data_point
+    
     def load_json_file(self, filepath: str) -> DataPointType:
         """Load a single JSON eval data file."""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            data_point_class = self.get_data_point_class()
-            data_point = data_point_class.from_dict(data)
-            data_point.filename = os.path.basename(filepath)
-                
-            return data_point
+            return self._load_data_point(filepath)
         except Exception as e:
             logger.error(f"Failed to load {filepath}: {e}")
             raise
     
-    def load_all_data(self, pattern: str = "*.json") -> List[DataPointType]:
-        """Load all eval data files matching pattern."""
+    def _load_json_file_safe(self, filepath: str) -> Optional[DataPointType]:
+        """Load a single JSON eval data file, returning None instead of raising on failure."""
+        try:
+            return self._load_data_point(filepath)
+        except Exception as e:
+            logger.error(f"Skipping {filepath}: {e}")
+            return None
+    
+    def _find_data_files(self, pattern: str) -> List[str]:
+        """List files in the data directory matching pattern, sorted by path."""
+        # scandir entries carry their file type, avoiding a stat per match as glob does
+        if pattern == "*.json":
+            matches = lambda name: name.endswith(".json")
+        else:
+            matches = lambda name: fnmatch.fnmatchcase(name, pattern)
+        with os.scandir(self.data_dir) as entries:
+            return sorted(
+                entry.path for entry in entries
+                # Like glob, skip hidden entries
+                if not entry.name.startswith('.') and entry.is_file(follow_symlinks=False) and matches(entry.name)
+            )
+    
+    def load_all_data(self, pattern: str = "*.json", max_workers: Optional[int] = None) -> List[DataPointType]:
+        """Load all eval data files matching pattern, reading files concurrently."""
         data_points = []
         
         if not os.path.exists(self.data_dir):
             logger.warning(f"Data directory not found: {self.data_dir}")
             return data_points
         
-        pattern_path = os.path.join(self.data_dir, pattern)
-        json_files = glob.glob(pattern_path)
+        json_files = self._find_data_files(pattern)
         
         logger.info(f"Found {len(json_files)} data files")
         
-        for filepath in sorted(json_files):
-            try:
-                data_point = self.load_json_file(filepath)
-                # Apply evaluation-specific filtering
-                if self.should_include_data_point(data_point):
-                    data_points.append(data_point)
-            except Exception as e:
-                logger.error(f"Skipping {filepath}: {e}")
-                continue
+        # File reads are I/O bound, so threads overlap them despite the GIL
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            loaded = list(executor.map(self._load_json_file_safe, json_files))
+        
+        # Apply evaluation-specific filtering
+        for data_point in loaded:
+            if data_point is not None and self.should_include_data_point(data_point):
+                data_points.append(data_point)
         
         return data_points
     
@@ -84,22 +189,17 @@ class BaseDataLoader(ABC, Generic[DataPointType]):
             logger.warning(f"Data directory not found: {self.data_dir}")
             return
         
-        pattern_path = os.path.join(self.data_dir, pattern)
-        json_files = sorted(glob.glob(pattern_path))
+        json_files = self._find_data_files(pattern)
         
         batch = []
         for filepath in json_files:
-            try:
-                data_point = self.load_json_file(filepath)
-                if self.should_include_data_point(data_point):
-                    batch.append(data_point)
-                    
-                    if len(batch) >= batch_size:
-                        yield batch
-                        batch = []
-            except Exception as e:
-                logger.error(f"Skipping {filepath}: {e}")
-                continue
+            data_point = self._load_json_file_safe(filepath)
+            if data_point is not None and self.should_include_data_point(data_point):
+                batch.append(data_point)
+                
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
         
         # Yield remaining batch
         if batch:
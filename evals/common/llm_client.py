@@ -2,17 +2,37 @@
 LLM Client with automatic server management for evaluations.
 """
 import os
+import socket
 import subprocess
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import psutil
 import yaml
 import json
 from typing import Dict, Any, Optional, List
 import logging
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Seconds a successful /health response is trusted before probing again
+HEALTH_CHECK_TTL = 5.0
+
+def _loads(raw):
+    """Parse JSON text or bytes, with orjson when available."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
 class LLMResponse:
     """Response from LLM generation."""
     def __init__(self, content: str, tokens_generated: int, time_taken: float, tokens_second: float):
@@ -22,10 +42,12 @@ class LLMResponse:
         self.tokens_second = tokens_second
 
 class LLMClient:
-    def __init__(self, config_path: str = "config.yaml"):
-        """Initialize LLM client with configuration."""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+    def __init__(self, config_path: str = "config.yaml", config: Optional[Dict[str, Any]] = None):
+        """Initialize LLM client with configuration, reusing an already loaded config if given."""
+        if config is None:
+            with open(config_path, 'r') as f:
+                config = yaml.load(f, Loader=_YamlLoader)
+        self.config = config
         
         self.server_config = self.config['server']
         self.startup_config = self.server_config.get('startup_config', {})
@@ -35,9 +57,58 @@ class LLMClient:
         self.base_url = f"http://{self.startup_config['host']}:{self.startup_config['port']}"
         self.server_process = None
         self._session_params = {}
+        # generation_config merged with session params, rebuilt only when those change
+        self._base_params = dict(self.generation_config)
+        # Monotonic time of the last successful health check; see _is_server_running
+        self._last_health_ok = 0.0
+        # Parallel slots reported by the running server; see get_server_slots
+        self._server_slots: Optional[int] = None
+        # Held while starting the server so concurrent generate() calls don't each launch one
+        self._start_lock = threading.Lock()
+        # Encoded response_format fragments keyed by schema text
+        self._response_formats: Dict[str, bytes] = {}
         
+        # One keep-alive pool to the local server, sized from the configured slot count
+        # until the evaluator reports the concurrency it actually uses; see size_pool
+        self._session = requests.Session()
+        self._pool_size = 0
+        self.size_pool(int(self.startup_config.get('np', 4)))
+        
+    def size_pool(self, concurrency: int):
+        """Size the connection pool for `concurrency` requests in flight, with two connections each."""
+        pool_size = 2 * max(1, concurrency)
+        if pool_size == self._pool_size:
+            return
+        previous = self._session.adapters.get(self.base_url)
+        self._session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+        if previous is not None:
+            previous.close()
+        self._pool_size = pool_size
+        
+    def _pid_file_path(self) -> str:
+        """Path of the file recording the PID of the server we launched, in the evals directory."""
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'llama-server.pid')
+    
+    def _process_from_pid_file(self) -> Optional[psutil.Process]:
+        """Return the server process recorded in the PID file, if it is still alive."""
+        try:
+            with open(self._pid_file_path(), 'r') as f:
+                proc = psutil.Process(int(f.read().strip()))
+            # PIDs get reused, so make sure this is still a server process
+            name = proc.name()
+            exe_name = os.path.basename(self.server_config['executable'])
+            if 'llama-server' in name or name == exe_name:
+                return proc
+        except (OSError, ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return None
+    
     def _find_server_process(self) -> Optional[psutil.Process]:
         """Find existing llama.cpp server process."""
+        proc = self._process_from_pid_file()
+        if proc is not None:
+            return proc
+        
         for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
             try:
                 # Check if process name contains llama-server
@@ -87,19 +158,34 @@ class LLMClient:
         
         try:
             logger.info(f"Starting server: {' '.join(cmd)}")
+            # Nothing reads the server's output, and an undrained pipe would fill
+            # and stall the server mid-generation, so discard it
             self.server_process = subprocess.Popen(
                 cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
                 cwd=os.path.dirname(server_exe)
             )
+            try:
+                with open(self._pid_file_path(), 'w') as f:
+                    f.write(str(self.server_process.pid))
+            except OSError as e:
+                logger.warning(f"Could not write server PID file: {e}")
             
-            # Wait for server to start
-            for _ in range(30):  # 30 second timeout
-                if self._is_server_running():
+            # Wait for server to start, probing the port cheaply before paying for an
+            # HTTP health check and backing off from 50ms up to 1s between attempts
+            host, port = self.startup_config['host'], int(self.startup_config['port'])
+            deadline = time.monotonic() + 30  # 30 second timeout
+            delay = 0.05
+            while time.monotonic() < deadline:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                    probe.settimeout(0.2)
+                    port_open = probe.connect_ex((host, port)) == 0
+                if port_open and self._is_server_running():
                     logger.info("Server started successfully")
                     return True
-                time.sleep(1)
+                time.sleep(delay)
+                delay = min(delay * 1.5, 1.0)
                 
             logger.error("Server failed to start within timeout")
             return False
@@ -110,14 +196,49 @@ class LLMClient:
     
     def _is_server_running(self) -> bool:
         """Check if server is responding."""
+        # A recent healthy check is trusted for a few seconds so back-to-back
+        # generations don't each pay an extra round trip
+        if time.monotonic() - self._last_health_ok < HEALTH_CHECK_TTL:
+            return True
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=2)
-            return response.status_code == 200
+            response = self._session.get(f"{self.base_url}/health", timeout=2)
         except:
             return False
+        if response.status_code != 200:
+            return False
+        self._last_health_ok = time.monotonic()
+        return True
+    
+    def _ensure_server(self):
+        """Start the server if it isn't responding, letting only one thread try at a time."""
+        if self._is_server_running():
+            return
+        with self._start_lock:
+            # Another thread may have brought the server back while this one waited
+            if not self._is_server_running() and not self._start_server():
+                raise RuntimeError("Failed to start LLM server")
+    
+    def get_server_slots(self) -> Optional[int]:
+        """
+        Get the number of parallel slots the running server decodes together.
+        
+        An already running server may have been started with a different -np than
+        this config, so ask it rather than trusting startup_config. Returns None if
+        the server doesn't report it.
+        """
+        if self._server_slots is None:
+            try:
+                response = self._session.get(f"{self.base_url}/props", timeout=2)
+                response.raise_for_status()
+                self._server_slots = int(_loads(response.content)['total_slots'])
+            except Exception as e:
+                logger.debug(f"Could not read server slot count: {e}")
+        return self._server_slots
     
     def _stop_server(self):
         """Stop the server if we started it."""
+        self._last_health_ok = 0.0
+        self._server_slots = None
         if self.server_process and hasattr(self.server_process, 'terminate'):
             try:
                 self.server_process.terminate()
@@ -129,16 +250,29 @@ class LLMClient:
                     logger.info("Server force killed")
                 except:
                     logger.error("Failed to stop server")
+                    return
+            try:
+                os.remove(self._pid_file_path())
+            except OSError:
+                pass
     
-    def generate(self, prompt: str, schema: Optional[str] = None, **kwargs) -> LLMResponse:
-        """Generate text using the LLM with optional JSON schema constraint."""
-        if not self._is_server_running():
-            if not self._start_server():
-                raise RuntimeError("Failed to start LLM server")
+    def _response_format_bytes(self, schema: str) -> bytes:
+        """Get the encoded response_format fragment for a schema, encoding it once per schema."""
+        fragment = self._response_formats.get(schema)
+        if fragment is None:
+            fragment = orjson.dumps({"type": "json_object", "schema": orjson.loads(schema)})
+            self._response_formats[schema] = fragment
+        return fragment
+    
+    def generate(self, prompt: str, schema: Optional[str] = None, timeout: Optional[float] = None, **kwargs) -> LLMResponse:
+        """
+        Generate text using the LLM with optional JSON schema constraint.
+        
+        timeout bounds the wait for the server, in seconds; None waits indefinitely.
+        Failed requests are not retried here, so callers own the retry policy.
+        """
+        self._ensure_server()
         
-        # Merge session params with generation config and kwargs
-        params = {**self.generation_config, **self._session_params, **kwargs}
-
         messages = [{
             "role": "user",
             "content": prompt
@@ -147,26 +281,45 @@ class LLMClient:
         payload = {
             "model": "gpt-6",
             "messages": messages,
-            **params
+            **self._base_params
         }
-        
-        # Add JSON schema if provided
-        if schema:
-            payload["response_format"] = {
-                "type": "json_object",
-                "schema": json.loads(schema)
-            }
+        # Per-call overrides win over session params and generation config
+        if kwargs:
+            payload.update(kwargs)
         
         try:
             start_time = time.time()
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions",
-                json=payload,
-            )
+            if orjson is not None:
+                # Serialize the payload in C
+                body = orjson.dumps(payload)
+                if schema:
+                    # Splice in the schema's pre-encoded response_format instead of
+                    # parsing and re-encoding the schema on every call
+                    body = body[:-1] + b',"response_format":' + self._response_format_bytes(schema) + b'}'
+                post_kwargs = {"data": body, "headers": {"Content-Type": "application/json"}}
+            else:
+                # Add JSON schema if provided
+                if schema:
+                    payload["response_format"] = {
+                        "type": "json_object",
+                        "schema": json.loads(schema)
+                    }
+                post_kwargs = {"json": payload}
+            try:
+                response = self._session.post(
+                    f"{self.base_url}/v1/chat/completions",
+                    timeout=timeout,
+                    **post_kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                # The cached health check is stale, so the next call probes the server again
+                self._last_health_ok = 0.0
+                raise
             response.raise_for_status()
             
             try:
-                result = response.json()
+                # Parse the raw body directly, skipping the decode to response.text
+                result = _loads(response.content)
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse JSON response: {e}")
                 logger.error(f"Response content: {response.text}")
@@ -192,10 +345,16 @@ class LLMClient:
     def set_session_params(self, **params):
         """Set parameters that persist for this session."""
         self._session_params.update(params)
+        self._base_params = {**self.generation_config, **self._session_params}
     
     def clear_session_params(self):
         """Clear session parameters."""
         self._session_params.clear()
+        self._base_params = dict(self.generation_config)
+    
+    def close(self):
+        """Close pooled HTTP connections to the server."""
+        self._session.close()
     
     def __enter__(self):
         """Context manager entry."""
@@ -207,3 +366,4 @@ class LLMClient:
         """Context manager exit."""
         if self.server_config.get('auto_stop', True):
             self._stop_server()
+        self.close()
@@ -2,45 +2,86 @@
 YAML-based prompt management system for evaluations.
 """
 import os
+import string
 import yaml
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import logging
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 logger = logging.getLogger(__name__)
 
+def _compile_template(template: str) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """
+    Pre-parse a str.format template into (literal, field_name) segments.
+    
+    Returns None when the template uses anything beyond plain named fields
+    (format specs, conversions, attribute/index access, positional fields),
+    in which case callers should fall back to str.format.
+    """
+    segments = []
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+        if field_name is not None and (format_spec or conversion or not field_name.isidentifier()):
+            return None
+        segments.append((literal, field_name))
+    return segments
+
 class PromptManager:
     def __init__(self, prompts_dir: str = "prompts"):
         """Initialize prompt manager with prompts directory."""
         self.prompts_dir = prompts_dir
         self.prompts_cache = {}
-        self._load_all_prompts()
+        self._prompt_files: Dict[str, str] = {}
+        self._scan_prompt_files()
     
-    def _load_all_prompts(self):
-        """Load all YAML prompt files into cache."""
+    def _scan_prompt_files(self):
+        """Map each evaluation type to its YAML file. Files are parsed on first use."""
         if not os.path.exists(self.prompts_dir):
             logger.warning(f"Prompts directory not found: {self.prompts_dir}")
             return
         
-        # Load prompt files directly in the prompts directory
-        # Each YAML file represents one evaluation type
-        for filename in os.listdir(self.prompts_dir):
-            if filename.endswith('.yaml') or filename.endswith('.yml'):
-                filepath = os.path.join(self.prompts_dir, filename)
-                eval_type = filename.replace('.yaml', '').replace('.yml', '')
-                
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        self.prompts_cache[eval_type] = yaml.safe_load(f)
-                    logger.info(f"Loaded prompts for: {eval_type}")
-                except Exception as e:
-                    logger.error(f"Failed to load {filepath}: {e}")
+        # Each YAML file directly in the prompts directory represents one evaluation type
+        with os.scandir(self.prompts_dir) as it:
+            for entry in it:
+                if entry.name.endswith(('.yaml', '.yml')) and entry.is_file():
+                    eval_type = entry.name.replace('.yaml', '').replace('.yml', '')
+                    self._prompt_files[eval_type] = entry.path
+    
+    def _get_eval_prompts(self, eval_type: str) -> Dict[str, Any]:
+        """Get the prompts for an evaluation type, loading its file on first access."""
+        eval_prompts = self.prompts_cache.get(eval_type)
+        if eval_prompts is not None:
+            return eval_prompts
+        
+        filepath = self._prompt_files.get(eval_type)
+        if filepath is None:
+            raise ValueError(f"Eval type '{eval_type}' not found. Available: {self.list_eval_types()}")
+        try:
+            with open(filepath, 'rb') as f:
+                eval_prompts = yaml.load(f, Loader=_YamlLoader)
+        except Exception as e:
+            logger.error(f"Failed to load {filepath}: {e}")
+            raise ValueError(f"Failed to load prompts for eval type '{eval_type}': {e}")
+        logger.info(f"Loaded prompts for: {eval_type}")
+        self.prompts_cache[eval_type] = eval_prompts
+        return eval_prompts
     
     def get_prompt(self, eval_type: str, prompt_name: str, **kwargs) -> str:
         """Get a formatted prompt by eval type and name."""
-        if eval_type not in self.prompts_cache:
-            raise ValueError(f"Eval type '{eval_type}' not found. Available: {list(self.prompts_cache.keys())}")
+        return self.get_prompt_renderer(eval_type, prompt_name)(**kwargs)
+    
+    def get_prompt_renderer(self, eval_type: str, prompt_name: str) -> Callable[..., str]:
+        """
+        Get a function that formats the given prompt from keyword arguments.
         
-        eval_prompts = self.prompts_cache[eval_type]
+        The template is looked up and pre-parsed once, so hot loops can hold on to
+        the renderer instead of calling get_prompt for every item. Renderers keep
+        the template they were built from across reload_prompts.
+        """
+        eval_prompts = self._get_eval_prompts(eval_type)
         
         if prompt_name not in eval_prompts:
             raise ValueError(f"Prompt '{prompt_name}' not found in {eval_type}. Available: {list(eval_prompts.keys())}")
@@ -55,18 +96,27 @@ class PromptManager:
         else:
             raise ValueError(f"Invalid prompt format for {eval_type}.{prompt_name}")
         
-        # Format the prompt with provided kwargs
-        try:
-            return prompt_template.format(**kwargs)
-        except KeyError as e:
-            raise ValueError(f"Missing template variable {e} for prompt {eval_type}.{prompt_name}")
+        segments = _compile_template(prompt_template)
+        
+        def render(**kwargs) -> str:
+            # Format the prompt with provided kwargs
+            try:
+                if segments is None:
+                    return prompt_template.format(**kwargs)
+                parts = []
+                for literal, field_name in segments:
+                    parts.append(literal)
+                    if field_name is not None:
+                        parts.append(str(kwargs[field_name]))
+                return ''.join(parts)
+            except KeyError as e:
+                raise ValueError(f"Missing template variable {e} for prompt {eval_type}.{prompt_name}")
+        
+        return render
     
     def get_prompt_info(self, eval_type: str, prompt_name: str) -> Dict[str, Any]:
         """Get full prompt information including metadata."""
-        if eval_type not in self.prompts_cache:
-            raise ValueError(f"Eval type '{eval_type}' not found")
-        
-        eval_prompts = self.prompts_cache[eval_type]
+        eval_prompts = self._get_eval_prompts(eval_type)
         
         if prompt_name not in eval_prompts:
             raise ValueError(f"Prompt '{prompt_name}' not found in {eval_type}")
@@ -87,18 +137,17 @@ class PromptManager:
     
     def list_eval_types(self) -> List[str]:
         """List all available evaluation types."""
-        return list(self.prompts_cache.keys())
+        return list(self._prompt_files)
     
     def list_prompts(self, eval_type: str) -> List[str]:
         """List all prompts for a given evaluation type."""
-        if eval_type not in self.prompts_cache:
-            raise ValueError(f"Eval type '{eval_type}' not found")
-        return list(self.prompts_cache[eval_type].keys())
+        return list(self._get_eval_prompts(eval_type).keys())
     
     def reload_prompts(self):
         """Reload all prompts from disk."""
         self.prompts_cache.clear()
-        self._load_all_prompts()
+        self._prompt_files.clear()
+        self._scan_prompt_files()
     
     def validate_prompt(self, eval_type: str, prompt_name: str, **test_kwargs) -> bool:
         """Validate that a prompt can be formatted with given kwargs."""
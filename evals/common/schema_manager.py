@@ -9,19 +9,34 @@ from pathlib import Path
 from typing import Dict, Any, Optional
 import logging
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
 logger = logging.getLogger(__name__)
 
 class SchemaManager:
     """Manages JSON schemas for evaluation prompts and responses."""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        """Initialize schema manager with configuration."""
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+    def __init__(self, config_path: str = "config.yaml", config: Optional[Dict[str, Any]] = None):
+        """Initialize schema manager with configuration, reusing an already loaded config if given."""
+        if config is None:
+            with open(config_path, 'r') as f:
+                config = yaml.load(f, Loader=_YamlLoader)
+        self.config = config
         
         self.schema_config = self.config.get('schemas', {})
         self.schema_dir = self.schema_config.get('schema_dir', './schemas')
         self.schemas = {}
+        # Compiled validators per schema key, built once so validate_response
+        # doesn't re-interpret the schema for every response
+        self._validators = {}
         
         # Create schema directory if it doesn't exist
         os.makedirs(self.schema_dir, exist_ok=True)
@@ -39,18 +54,31 @@ class SchemaManager:
             logger.warning(f"Schema directory not found: {self.schema_dir}")
             return
                     
-        for filename in os.listdir(self.schema_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.schema_dir, filename)
-                schema_key = filename.replace('.json', '')
+        with os.scandir(self.schema_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                schema_key = entry.name.replace('.json', '')
                 
                 try:
-                    with open(filepath, 'r') as f:
-                        schema_obj = f.read()
-                    self.schemas[schema_key] = schema_obj
+                    with open(entry.path, 'r') as f:
+                        self.schemas[schema_key] = f.read()
+                    self._compile_validator(schema_key, self.schemas[schema_key])
                     logger.info(f"Loaded schema file: {schema_key}")
                 except Exception as e:
-                    logger.error(f"Failed to load schema file {filepath}: {e}")
+                    logger.error(f"Failed to load schema file {entry.path}: {e}")
+    
+    def _compile_validator(self, schema_key: str, schema_obj: Any):
+        """Compile and store a validator for a schema when fastjsonschema is available."""
+        if fastjsonschema is None:
+            return
+        try:
+            if isinstance(schema_obj, str):
+                schema_obj = json.loads(schema_obj)
+            self._validators[schema_key] = fastjsonschema.compile(schema_obj)
+        except Exception as e:
+            self._validators.pop(schema_key, None)
+            logger.error(f"Failed to compile validator for schema {schema_key}: {e}")
     
     def get_schema(self, schema_key: str) -> Optional[str]:
         """Get a schema by its key."""
@@ -66,6 +94,7 @@ class SchemaManager:
             
             # Also update in-memory cache
             self.schemas[schema_key] = schema_obj
+            self._compile_validator(schema_key, schema_obj)
             
             logger.info(f"Saved schema: {schema_key} to {filepath}")
             return filepath
@@ -82,12 +111,18 @@ class SchemaManager:
             return False
         
         try:
-            # Basic validation - could use jsonschema library for full validation
             if isinstance(response_data, str):
                 response_data = json.loads(response_data)
             
-            # Simple validation for required fields
-            required_fields = schema.get('properties', {}).get('required', [])
+            validator = self._validators.get(schema_key)
+            if validator is not None:
+                validator(response_data)
+                return True
+            
+            # Without fastjsonschema, fall back to checking required fields
+            if isinstance(schema, str):
+                schema = json.loads(schema)
+            required_fields = schema.get('required', [])
             if isinstance(response_data, dict):
                 for field in required_fields:
                     if field not in response_data:
@@ -1,18 +1,79 @@
 #!/usr/bin/env python3
+import atexit
+import dataclasses
+import importlib.util
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 import yaml
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+def _load_module(name: str, path: Path):
+    """
+    Import a module from an explicit file path, registering it under its bare name.
+    
+    Registering in sys.modules lets the eval modules' own `from llm_client import ...`
+    style imports resolve to the same objects, loaded once. eval.py itself adds nothing
+    to sys.path, but evaluate.py and task_detection_data_loader.py still insert their
+    own directories so they can be imported standalone.
+    
+    A module already registered under the name is reused only if it was loaded from
+    path. Anything else (e.g. the HF `evaluate` package) is replaced, since the eval
+    modules' bare imports must resolve to the files here.
+    """
+    previous = sys.modules.get(name)
+    if previous is not None:
+        loaded_from = getattr(previous, '__file__', None)
+        if loaded_from and os.path.realpath(loaded_from) == os.path.realpath(path):
+            return previous
+        logging.getLogger(__name__).warning(
+            f"Replacing already imported module '{name}' ({loaded_from or previous!r}) with {path}"
+        )
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        if previous is not None:
+            sys.modules[name] = previous
+        else:
+            del sys.modules[name]
+        raise
+    return module
+
 def setup_logging(level: str = "INFO"):
     """Setup logging configuration."""    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    # Evaluator threads only enqueue records; a background listener does the writes
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    # Pass records through unformatted; the stream handler applies the real format
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
     logging.basicConfig(
         level=getattr(logging, level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.StreamHandler(sys.stdout)
+            queue_handler
         ]
     )
 
@@ -27,7 +88,7 @@ def load_config(config_path: str = "config.yaml") -> dict:
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
     
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=_YamlLoader)
 
 def run_task_detection_evaluation(config: dict):
     """Run task detection evaluation based on configuration."""
@@ -36,16 +97,16 @@ def run_task_detection_evaluation(config: dict):
     task_detection_dir = script_dir / 'task-detection'
     common_dir = script_dir / 'common'
     
-    # Add paths to Python path
-    sys.path.insert(0, str(task_detection_dir))
-    sys.path.insert(0, str(common_dir))
-    
     try:
-        from llm_client import LLMClient
-        from prompt_manager import PromptManager
-        from schema_manager import SchemaManager
-        from evaluate import TaskDetectionEvaluator
-        from task_detection_data_loader import TaskDetectionDataLoader
+        # Load dependencies before the modules that import them by bare name
+        _load_module('data_loader', common_dir / 'data_loader.py')
+        LLMClient = _load_module('llm_client', common_dir / 'llm_client.py').LLMClient
+        PromptManager = _load_module('prompt_manager', common_dir / 'prompt_manager.py').PromptManager
+        SchemaManager = _load_module('schema_manager', common_dir / 'schema_manager.py').SchemaManager
+        TaskDetectionDataLoader = _load_module(
+            'task_detection_data_loader', task_detection_dir / 'task_detection_data_loader.py'
+        ).TaskDetectionDataLoader
+        TaskDetectionEvaluator = _load_module('evaluate', task_detection_dir / 'evaluate.py').TaskDetectionEvaluator
         
         eval_config = config['evaluation']['task_detection']
         
@@ -57,7 +118,7 @@ def run_task_detection_evaluation(config: dict):
         
         # Initialize components with script-relative paths
         config_path = str(script_dir / 'config.yaml')
-        llm_client = LLMClient(config_path)
+        llm_client = LLMClient(config_path, config=config)
         prompt_manager = PromptManager(str(script_dir / 'prompts'))
         
         # Make data directory relative to script if not absolute
@@ -67,7 +128,7 @@ def run_task_detection_evaluation(config: dict):
         
         # Use the task detection specific data loader
         task_data_loader = TaskDetectionDataLoader(data_dir)
-        schema_manager = SchemaManager(config_path)
+        schema_manager = SchemaManager(config_path, config=config)
         evaluator = TaskDetectionEvaluator(llm_client, prompt_manager, schema_manager, config, task_data_loader)
         
         # Load data
@@ -84,10 +145,21 @@ def run_task_detection_evaluation(config: dict):
         stats = task_data_loader.get_task_detection_stats(data_points)
         logger.info(f"Data stats: {stats}")
         
+        # With a checkpoint configured, results stream to it as they finish so an interrupted run can resume
+        checkpoint_file = eval_config.get('checkpoint_file')
+        if checkpoint_file and not os.path.isabs(checkpoint_file):
+            checkpoint_file = str(script_dir / checkpoint_file)
+        
         # Run evaluation
         with llm_client:  # Use context manager for server management
             logger.info("Starting task detection...")
-            results = evaluator.evaluate_batch(data_points)
+            if checkpoint_file:
+                # A single chunk, so there are no chunk boundaries to stall the server slots
+                results = evaluator.evaluate_batch_chunked(
+                    data_points, chunk_size=max(1, len(data_points)), checkpoint_path=checkpoint_file
+                )
+            else:
+                results = evaluator.evaluate_batch(data_points)
         
         # Compute aggregate metrics
         logger.info("Computing aggregate metrics...")
@@ -98,6 +170,8 @@ def run_task_detection_evaluation(config: dict):
         logger.info(f"Success rate: {aggregate_metrics.get('success_rate', 0):.2f}")
         logger.info(f"Total data points: {aggregate_metrics.get('total_data_points', 0)}")
         logger.info(f"Successful detections: {aggregate_metrics.get('successful_detections', 0)}")
+        if aggregate_metrics.get('cached_responses'):
+            logger.info(f"Answered from the response cache: {aggregate_metrics['cached_responses']} (excluded from timings)")
         logger.info(f"Average tokens generated: {aggregate_metrics.get('average_tokens_generated', 0):.2f}")
         logger.info(f"Average response time: {aggregate_metrics.get('average_response_time', 0):.2f} seconds")
         logger.info(f"Average tokens per second: {aggregate_metrics.get('average_tokens_per_second', 0):.2f}")
@@ -122,68 +196,115 @@ def run_task_detection_evaluation(config: dict):
             logger.info("Generating visualizations...")
             generate_visualizations(timestamped_output_file, viz_config['output_dir'])
         
+        if checkpoint_file:
+            # Everything is saved, so the next run starts fresh
+            try:
+                os.remove(checkpoint_file)
+            except FileNotFoundError:
+                pass
+        
         logger.info("Task detection evaluation finished successfully!")
         return 0
         
     except Exception as e:
         logger.error(f"Task detection evaluation failed: {e}", exc_info=True)
         return 1
-    finally:
-        # Remove from path
-        if str(task_detection_dir) in sys.path:
-            sys.path.remove(str(task_detection_dir))
-        if str(common_dir) in sys.path:
-            sys.path.remove(str(common_dir))
 
 def save_results(results, output_path: str, aggregate_metrics: dict, config: dict):
     """Save evaluation results to JSON file."""
-    from datetime import datetime
     import json
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
     
     logger = logging.getLogger(__name__)
     
-    # Convert results to serializable format
-    results_data = []
-    for result in results:
-        result_dict = {
-            'correct': result.correct,
-            'analysis': result.analysis,
-            'completed_steps': result.completed_steps,
-            'ground_truth': result.ground_truth,
-            'raw_response': result.raw_response
-        }
-        results_data.append(result_dict)
+    # Results are machine-read, so write compact JSON unless asked for readable output
+    pretty = config.get('results', {}).get('pretty_print', False)
+    
+    if orjson is not None:
+        # orjson emits UTF-8 bytes directly, so write them without a str round trip,
+        # and serializes result dataclasses natively without an intermediate dict
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        def dumps(obj) -> bytes:
+            return orjson.dumps(obj, option=option)
+    else:
+        json_kwargs = {'indent': 2} if pretty else {'separators': (',', ':')}
+        def dumps(obj) -> bytes:
+            if dataclasses.is_dataclass(obj):
+                obj = dataclasses.asdict(obj)
+            return json.dumps(obj, ensure_ascii=False, **json_kwargs).encode('utf-8')
     
-    # Prepare output data
-    output_data = {
+    # Header of the output; individual results are streamed after it
+    header = {
         'evaluation_info': {
             'timestamp': datetime.now().isoformat(),
             'total_data_points': len(results),
             'evaluation_type': 'task_detection',
             'config': config
         },
-        'aggregate_metrics': aggregate_metrics,
-        'individual_results': results_data
+        'aggregate_metrics': aggregate_metrics
     }
     
     # Create output directory if needed
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    # Save results
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    # Write results one record at a time so the whole document is never held in memory.
+    # Serialized JSON never contains raw newlines inside strings, so re-indenting
+    # each record by replacing newlines is safe.
+    with open(output_path, 'wb') as f:
+        if pretty:
+            f.write(dumps(header)[:-2])  # drop the closing "\n}"
+            f.write(b',\n  "individual_results": [')
+            for i, result in enumerate(results):
+                f.write(b',\n    ' if i else b'\n    ')
+                f.write(dumps(result).replace(b'\n', b'\n    '))
+            f.write(b'\n  ]\n}' if results else b']\n}')
+        else:
+            f.write(dumps(header)[:-1])  # drop the closing "}"
+            f.write(b',"individual_results":[')
+            for i, result in enumerate(results):
+                if i:
+                    f.write(b',')
+                f.write(dumps(result))
+            f.write(b']}')
     
     logger.info(f"Results saved to: {output_path}")
+    
+    if config.get('results', {}).get('write_parquet', True):
+        save_results_parquet(results, str(Path(output_path).with_suffix('.parquet')))
+
+def save_results_parquet(results, output_path: str):
+    """Save individual results as a columnar Parquet table next to the JSON results."""
+    logger = logging.getLogger(__name__)
+    if pa is None:
+        logger.debug("pyarrow not installed; skipping Parquet results")
+        return
+    if not results:
+        return
+    
+    # Build each column straight from the result objects, without per-row dicts
+    columns = {
+        field.name: [getattr(result, field.name) for result in results]
+        for field in dataclasses.fields(results[0])
+    }
+    try:
+        pq.write_table(pa.table(columns), output_path, compression='zstd')
+    except Exception as e:
+        # The JSON results are already written; a missing sidecar shouldn't fail the run
+        logger.error(f"Parquet results failed: {e}")
+        return
+    logger.info(f"Results table saved to: {output_path}")
 
 def generate_visualizations(results_file: str, output_dir: str):
     """Generate visualization plots."""
     logger = logging.getLogger(__name__)
     script_dir = Path(__file__).parent
     task_detection_dir = script_dir / 'task-detection'
-    sys.path.insert(0, str(task_detection_dir))
     
     try:
-        from visualize import EvalVisualizer
+        EvalVisualizer = _load_module('visualize', task_detection_dir / 'visualize.py').EvalVisualizer
         
         # Make output dir relative to script if not absolute
         if not os.path.isabs(output_dir):
@@ -198,10 +319,6 @@ def generate_visualizations(results_file: str, output_dir: str):
         logger.warning(f"Visualization module not available: {e}")
     except Exception as e:
         logger.error(f"Visualization failed: {e}")
-    finally:
-        # Remove from path
-        if str(task_detection_dir) in sys.path:
-            sys.path.remove(str(task_detection_dir))
 
 def main():
     """Main function."""
@@ -1,14 +1,19 @@
 """
 Task detection evaluation implementation.
 """
+import hashlib
 import json
 import logging
 import sys
 import os
+import random
+import tempfile
+import threading
+import requests
 from tqdm import tqdm
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import time
 
 # Add parent directory to path to import common modules
@@ -21,14 +26,51 @@ current_dir = os.path.dirname(__file__)
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-from llm_client import LLMClient
+from llm_client import LLMClient, LLMResponse
 from prompt_manager import PromptManager
 from schema_manager import SchemaManager
 from task_detection_data_loader import TaskDetectionDataLoader, TaskDetectionDataPoint
+from data_loader import load_json_bytes, dump_json_str
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# First retry waits this many seconds, doubling for each retry after it
+RETRY_BASE_DELAY = 1.0
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a generation error is worth retrying: dropped connections, timeouts, 429s and 5xx."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+class TokenBucket:
+    """Thread-safe token bucket that holds callers to a steady request rate."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """Allow `rate` takes per second on average, with bursts of up to `capacity`."""
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate * 2)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def take(self, n: float = 1.0):
+        """Take n tokens, sleeping until they have accrued if the bucket is short."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve the tokens now so concurrent callers queue behind this one,
+            # then wait outside the lock for the deficit to refill
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+@dataclass(slots=True)
 class TaskDetectionResult:
     """Result of task detection."""
     filename: str
@@ -40,6 +82,8 @@ class TaskDetectionResult:
     tokens_generated: int
     response_time: float
     tokens_per_second: float
+    attempts: int = 1
+    cached: bool = False  # Answered from the response cache; timings are from the original request
 
 class TaskDetectionEvaluator:
     """Evaluates task detection performance."""
@@ -51,6 +95,36 @@ class TaskDetectionEvaluator:
         self.schema_manager = schema_manager
         self.data_loader = data_loader or TaskDetectionDataLoader()
         self.config = config
+        
+        # Resolve and pre-parse both prompt templates once rather than per data point
+        self._render_detect = prompt_manager.get_prompt_renderer('task-detection', 'detect_tasks')
+        self._render_detect_no_summary = prompt_manager.get_prompt_renderer('task-detection', 'detect_tasks_no_summary')
+        
+        # Optional caps on requests and estimated prompt tokens per second, shared by every worker thread
+        requests_per_second = config.get('parallel', {}).get('requests_per_second')
+        self._rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        prompt_tokens_per_second = config.get('parallel', {}).get('prompt_tokens_per_second')
+        self._token_limiter = TokenBucket(prompt_tokens_per_second) if prompt_tokens_per_second else None
+        
+        # Bound each request so a hung server fails the attempt instead of blocking a worker forever
+        self._request_timeout = self.get_parallel_config()['request_timeout']
+        
+        # Every data point is constrained by the same schema, so look it up (and warn if it's missing) once
+        self._schema = self._get_schema()
+        
+        # Model responses can be cached on disk so reruns over unchanged prompts skip the server.
+        # Keys also cover the model and generation settings, so changing either misses.
+        task_config = config.get('evaluation', {}).get('task_detection', {})
+        if task_config.get('response_cache', False):
+            self._response_cache_dir = os.path.join(self.data_loader.cache_dir, 'responses')
+        else:
+            self._response_cache_dir = None
+        self._response_cache_salt = json.dumps(
+            [config.get('model'), config.get('generation')], sort_keys=True, default=str
+        ).encode()
+        # Response cache hits and misses for the current batch, updated from worker threads
+        self._cache_counts = {'hits': 0, 'misses': 0}
+        self._cache_counts_lock = threading.Lock()
     
     def get_parallel_config(self) -> Dict[str, Any]:
         """Get parallel processing configuration from config."""
@@ -60,196 +134,435 @@ class TaskDetectionEvaluator:
         return {
             'max_workers': server_config.get('np', parallel_config.get('max_concurrent_requests', 1)),
             'request_timeout': parallel_config.get('request_timeout', 60),
+            'max_retries': parallel_config.get('max_retries', 2),
             'batch_size': self.config.get('evaluation', {}).get('task_detection', {}).get('batch_size', 10)
         }
     
-    def detect_tasks(self, data_point: TaskDetectionDataPoint) -> TaskDetectionResult:
-        """Run task detection on a single data point."""
-        
-        # Use the data loader to prepare prompt data
-        prompt_data = self.data_loader.prepare_prompt_data(data_point)
-        
-        # Get task detection prompt
-        detect_prompt = self.prompt_manager.get_prompt(
-            'task-detection', 
-            'detect_tasks',
-            **prompt_data
-        )
-        
-        # Get the schema for structured response
+    def _get_schema(self) -> Optional[str]:
+        """Get the schema that constrains task detection responses, if one exists."""
         schema_key = self.data_loader.get_evaluation_schema_key()
         schema = self.schema_manager.get_schema(schema_key)
         if not schema:
             logger.warning(f"No schema found for {schema_key}. Using default response format.")
-            schema = None
-        
-        # Generate task detection with schema constraint
+            return None
+        return schema
+    
+    def _build_prompt(self, data_point: TaskDetectionDataPoint, use_summary: bool = True) -> str:
+        """Render the task detection prompt for a data point."""
+        if use_summary:
+            return self._render_detect(**self.data_loader.prepare_prompt_data(data_point))
+        return self._render_detect_no_summary(**self.data_loader.prepare_prompt_data_no_summary(data_point))
+    
+    def _response_cache_path(self, prompt: str, schema: Optional[str]) -> str:
+        """Path of the cached response for a prompt and schema under the current model settings."""
+        digest = hashlib.sha256(self._response_cache_salt)
+        digest.update(b'\0' + prompt.encode())
+        digest.update(b'\0' + (schema or '').encode())
+        key = digest.hexdigest()
+        return os.path.join(self._response_cache_dir, key[:2], f"{key}.json")
+    
+    def _read_cached_response(self, path: str) -> Optional[LLMResponse]:
+        """Return the cached response stored at path, if there is a readable one."""
         try:
-            response = self.llm_client.generate(detect_prompt, schema)
-            
-            try:
-                parsed_response = json.loads(response.content)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse task detection response: {response.content}")
-                parsed_response = {"analysis": "Failed to parse response", "completed": []}
-
-            # Check correctness
-            completed_steps = parsed_response.get('completed', [])
-            ground_truth = data_point.ground_truth
-            correct = set(completed_steps) == set(ground_truth) and len(completed_steps) == len(ground_truth)
-            
-            return TaskDetectionResult(
-                filename=data_point.filename,
-                analysis=parsed_response.get('analysis', 'No analysis provided'),
-                completed_steps=parsed_response.get('completed', []),
-                raw_response=response.content,
-                correct=correct,
-                ground_truth=ground_truth,
-                tokens_generated=response.tokens_generated,
-                response_time=response.time_taken,
-                tokens_per_second=response.tokens_second
+            with open(path, 'rb') as f:
+                cached = load_json_bytes(f.read())
+            return LLMResponse(
+                content=cached['content'],
+                tokens_generated=cached['tokens_generated'],
+                time_taken=cached['time_taken'],
+                tokens_second=cached['tokens_second']
             )
-            
+        except Exception:
+            return None
+    
+    def _write_cached_response(self, path: str, response: LLMResponse):
+        """Store a response, replacing the entry atomically."""
+        try:
+            cache_dir = os.path.dirname(path)
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=cache_dir, suffix='.tmp', delete=False) as f:
+                f.write(dump_json_str({
+                    'content': response.content,
+                    'tokens_generated': response.tokens_generated,
+                    'time_taken': response.time_taken,
+                    'tokens_second': response.tokens_second
+                }))
+            os.replace(f.name, path)
         except Exception as e:
-            logger.error(f"Task detection failed for data point {data_point.filename}: {e}")
-            return TaskDetectionResult(
-                filename=data_point.filename,
-                analysis=f"Error: {str(e)}",
-                completed_steps=[],
-                raw_response="",
-                correct=False,
-                ground_truth=data_point.ground_truth,
-                tokens_generated=0,
-                response_time=0.0,
-                tokens_per_second=0.0
-            )
+            logger.warning(f"Failed to cache response: {e}")
+    
+    def _generate_with_retry(self, prompt: str, schema: Optional[str]) -> Tuple[LLMResponse, int]:
+        """
+        Generate a response, retrying transient failures with jittered exponential backoff.
         
-    def detect_tasks_no_summary(self, data_point: TaskDetectionDataPoint) -> TaskDetectionResult:
-
-        # Prepare prompt
-        prompt_data = self.data_loader.prepare_prompt_data_no_summary(data_point)
+        Returns the response and the number of attempts it took. The final error is
+        re-raised with an `attempts` attribute once retries run out.
+        """
+        max_attempts = 1 + max(0, self.get_parallel_config()['max_retries'])
+        for attempt in range(max_attempts):
+            if self._rate_limiter is not None:
+                self._rate_limiter.take()
+            if self._token_limiter is not None:
+                self._token_limiter.take(max(1, len(prompt) // 4))
+            try:
+                return self.llm_client.generate(prompt, schema, timeout=self._request_timeout), attempt + 1
+            except Exception as e:
+                if attempt + 1 >= max_attempts or not _is_transient(e):
+                    e.attempts = attempt + 1
+                    raise
+                delay = RETRY_BASE_DELAY * 2 ** attempt + random.random() * 0.1
+                logger.warning(f"Generation failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def _generate(self, prompt: str, schema: Optional[str]) -> Tuple[LLMResponse, int, bool]:
+        """
+        Generate the model's response to a rendered prompt.
+        
+        Returns the response, the attempts it took, and whether it came from the response cache.
+        """
+        if self._response_cache_dir is None:
+            return (*self._generate_with_retry(prompt, schema), False)
+        
+        path = self._response_cache_path(prompt, schema)
+        response = self._read_cached_response(path)
+        with self._cache_counts_lock:
+            self._cache_counts['hits' if response is not None else 'misses'] += 1
+        if response is not None:
+            return response, 1, True
+        response, attempts = self._generate_with_retry(prompt, schema)
+        self._write_cached_response(path, response)
+        return response, attempts, False
+    
+    def _log_cache_counts(self):
+        """Log and reset the response cache hit and miss counts, if the cache is enabled."""
+        if self._response_cache_dir is None:
+            return
+        with self._cache_counts_lock:
+            hits, misses = self._cache_counts['hits'], self._cache_counts['misses']
+            self._cache_counts['hits'] = self._cache_counts['misses'] = 0
+        logger.info(f"Response cache: {hits} hits, {misses} misses "
+                    f"(cached results are left out of timing metrics)")
+    
+    def _result_from_response(self, data_point: TaskDetectionDataPoint, response: LLMResponse, attempts: int = 1,
+                              cached: bool = False) -> TaskDetectionResult:
+        """Parse a model response and score it against the data point's ground truth."""
+        try:
+            parsed_response = load_json_bytes(response.content)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse task detection response: {response.content}")
+            parsed_response = {"analysis": "Failed to parse response", "completed": []}
 
-        # Get task detection prompt
-        detect_prompt = self.prompt_manager.get_prompt(
-            'task-detection', 
-            'detect_tasks_no_summary',
-            **prompt_data
+        # Check correctness
+        completed_steps = parsed_response.get('completed', [])
+        ground_truth = data_point.ground_truth
+        # The length check still matters: it marks repeated step ids as incorrect
+        correct = len(completed_steps) == len(ground_truth) and frozenset(completed_steps) == data_point.ground_truth_set()
+        
+        return TaskDetectionResult(
+            filename=data_point.filename,
+            analysis=parsed_response.get('analysis', 'No analysis provided'),
+            completed_steps=completed_steps,
+            raw_response=response.content,
+            correct=correct,
+            ground_truth=ground_truth,
+            tokens_generated=response.tokens_generated,
+            response_time=response.time_taken,
+            tokens_per_second=response.tokens_second,
+            attempts=attempts,
+            cached=cached
         )
-
-        # Get the schema for structured response
-        schema_key = self.data_loader.get_evaluation_schema_key()
-        schema = self.schema_manager.get_schema(schema_key)
-        if not schema:
-            logger.warning(f"No schema found for {schema_key}. Using default response format.")
-            schema = None
+    
+    def _error_result(self, data_point: TaskDetectionDataPoint, error: Exception) -> TaskDetectionResult:
+        """Build the result recorded for a data point whose detection failed."""
+        return TaskDetectionResult(
+            filename=data_point.filename,
+            analysis=f"Error: {str(error)}",
+            completed_steps=[],
+            raw_response="",
+            correct=False,
+            ground_truth=data_point.ground_truth,
+            tokens_generated=0,
+            response_time=0.0,
+            tokens_per_second=0.0,
+            attempts=getattr(error, 'attempts', 1)
+        )
+    
+    def _detect(self, data_point: TaskDetectionDataPoint, use_summary: bool) -> TaskDetectionResult:
+        """Run task detection on a single data point, recording failures as error results."""
+        schema = self._schema
         
         # Generate task detection with schema constraint
         try:
-            response = self.llm_client.generate(detect_prompt, schema)
-            
-            try:
-                parsed_response = json.loads(response.content)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse task detection response: {response.content}")
-                parsed_response = {"analysis": "Failed to parse response", "completed": []}
-
-            # Check correctness
-            completed_steps = parsed_response.get('completed', [])
-            ground_truth = data_point.ground_truth
-            correct = set(completed_steps) == set(ground_truth) and len(completed_steps) == len(ground_truth)
-            
-            return TaskDetectionResult(
-                filename=data_point.filename,
-                analysis=parsed_response.get('analysis', 'No analysis provided'),
-                completed_steps=parsed_response.get('completed', []),
-                raw_response=response.content,
-                correct=correct,
-                ground_truth=ground_truth,
-                tokens_generated=response.tokens_generated,
-                response_time=response.time_taken,
-                tokens_per_second=response.tokens_second
-            )
-            
+            return self._result_from_response(data_point, *self._generate(self._build_prompt(data_point, use_summary), schema))
         except Exception as e:
             logger.error(f"Task detection failed for data point {data_point.filename}: {e}")
-            return TaskDetectionResult(
-                filename=data_point.filename,
-                analysis=f"Error: {str(e)}",
-                completed_steps=[],
-                raw_response="",
-                correct=False,
-                ground_truth=data_point.ground_truth,
-                tokens_generated=0,
-                response_time=0.0,
-                tokens_per_second=0.0
-            )
+            return self._error_result(data_point, e)
+    
+    def detect_tasks(self, data_point: TaskDetectionDataPoint) -> TaskDetectionResult:
+        """Run task detection on a single data point."""
+        return self._detect(data_point, use_summary=True)
+        
+    def detect_tasks_no_summary(self, data_point: TaskDetectionDataPoint) -> TaskDetectionResult:
+        """Run task detection on a single data point without the previous summary."""
+        return self._detect(data_point, use_summary=False)
     
-    def evaluate_batch(self, data_points: List[TaskDetectionDataPoint]) -> List[TaskDetectionResult]:
-        """Evaluate a batch of data points with parallel processing."""
+    def _checkpoint_result(self, checkpoint, result: TaskDetectionResult):
+        """Append a finished result to an open checkpoint file, if there is one."""
+        if checkpoint is not None:
+            checkpoint.write(dump_json_str(asdict(result)) + '\n')
+            checkpoint.flush()
+    
+    def evaluate_batch(self, data_points: List[TaskDetectionDataPoint], checkpoint=None) -> List[TaskDetectionResult]:
+        """
+        Evaluate a batch of data points with parallel processing.
+        
+        If an open checkpoint file is given, each result is appended to it as a JSON
+        line as soon as it is scored.
+        """
         results = []
         
         # Get the parallelism configuration
         parallel_config = self.get_parallel_config()
         max_workers = parallel_config['max_workers']
 
-        task_fn = self.detect_tasks
         use_summary = self.config.get('evaluation', {}).get('task_detection', {}).get('use_summary', True)
         if not use_summary:
             # Use the no summary version of task detection
             logger.info("Using task detection without summary")
-            task_fn = self.detect_tasks_no_summary
         
-        # If only one worker or small batch, use sequential processing
-        if max_workers <= 1 or len(data_points) <= max_workers:
+        # Match the server's actual slot count: fewer requests in flight leave slots idle,
+        # more just queue on the server
+        server_slots = self.llm_client.get_server_slots()
+        # Connections for whichever is larger, so neither count ends up waiting on the pool
+        self.llm_client.size_pool(max(server_slots or 0, max_workers))
+        if server_slots and server_slots != max_workers:
+            logger.warning(f"Server has {server_slots} parallel slots but np is {max_workers}; "
+                           f"keeping {server_slots} requests in flight")
+            max_workers = server_slots
+        
+        # Only fall back to sequential processing when there is nothing to overlap.
+        # Small batches still go out concurrently so every server slot stays busy.
+        if max_workers <= 1 or len(data_points) <= 1:
             for data_point in tqdm(data_points, desc="Evaluating task detection", unit="data point"):
-                result = task_fn(data_point)
+                result = self._detect(data_point, use_summary)
                 results.append(result)
+                self._checkpoint_result(checkpoint, result)
+            self._log_cache_counts()
             return results
         
-        # Use parallel processing for larger batches
+        # Keep one request in flight per server slot; the server batches active
+        # slots together on each decode step
         results = [None] * len(data_points)  # Pre-allocate to maintain order
+        schema = self._schema
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_index = {
-                executor.submit(task_fn, data_point): i 
-                for i, data_point in enumerate(data_points)
-            }
+        workers = min(max_workers, len(data_points))
+        # Queue only a couple of requests per worker. Prompts are rendered as their turn
+        # comes, so rendered prompts and pending futures scale with the worker count, not the batch size.
+        max_pending = 2 * workers
+        
+        # Let tqdm coalesce redraws rather than writing to the terminal on every completion
+        with (
+            ThreadPoolExecutor(max_workers=workers) as executor,
+            tqdm(total=len(data_points), desc="Evaluating task detection", unit="data point",
+                 mininterval=0.5, miniters=max(1, len(data_points) // 200), smoothing=0.05) as pbar
+        ):
+            # Prompts are rendered here as requests are queued, and responses are parsed and
+            # scored here as they arrive. Workers only wait on the server, so each one moves
+            # on to its next request as soon as the last one returns.
+            def finish(outcome, indices):
+                if isinstance(outcome, Exception):
+                    for index in indices:
+                        logger.error(f"Data point {index} generated an exception: {outcome}")
+                        # Create error result
+                        results[index] = self._error_result(data_points[index], outcome)
+                        self._checkpoint_result(checkpoint, results[index])
+                else:
+                    for index in indices:
+                        try:
+                            results[index] = self._result_from_response(data_points[index], *outcome)
+                        except Exception as exc:
+                            # Responses of the wrong shape fail this data point, not the batch
+                            logger.error(f"Failed to score data point {index}: {exc}")
+                            results[index] = self._error_result(data_points[index], exc)
+                        self._checkpoint_result(checkpoint, results[index])
+                pbar.update(len(indices))
             
-            # Process completed tasks with progress bar
-            with tqdm(total=len(data_points), desc="Evaluating task detection", unit="data point") as pbar:
-                for future in as_completed(future_to_index):
-                    index = future_to_index[future]
+            # Data points that render to the same prompt share one request. A prompt in flight
+            # is tracked by its future; once done, only its digest and outcome are kept (the
+            # response text is held by the results anyway) so later duplicates reuse it too.
+            in_flight = {}  # prompt digest -> future
+            pending = {}  # future -> (prompt digest, indices of the data points waiting on it)
+            finished = {}  # prompt digest -> (response, attempts, cached) or the exception raised
+            queued = enumerate(data_points)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    i, data_point = next(queued, (None, None))
+                    if data_point is None:
+                        exhausted = True
+                        break
                     try:
-                        result = future.result(timeout=parallel_config['request_timeout'])
-                        results[index] = result
+                        prompt = self._build_prompt(data_point, use_summary)
                     except Exception as exc:
-                        logger.error(f"Data point {index} generated an exception: {exc}")
-                        # Create error result
-                        data_point = data_points[index]
-                        results[index] = TaskDetectionResult(
-                            filename=data_point.filename,
-                            analysis=f"Error: {str(exc)}",
-                            completed_steps=[],
-                            raw_response="",
-                            correct=False,
-                            ground_truth=data_point.ground_truth,
-                            tokens_generated=0,
-                            response_time=0.0,
-                            tokens_per_second=0.0
-                        )
-                    finally:
+                        logger.error(f"Failed to build prompt for data point {i}: {exc}")
+                        results[i] = self._error_result(data_point, exc)
+                        self._checkpoint_result(checkpoint, results[i])
                         pbar.update(1)
+                        continue
+                    
+                    key = hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+                    if key in finished:
+                        finish(finished[key], [i])
+                    elif key in in_flight:
+                        pending[in_flight[key]][1].append(i)
+                    else:
+                        future = executor.submit(self._generate, prompt, schema)
+                        in_flight[key] = future
+                        pending[future] = (key, [i])
+                
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, indices = pending.pop(future)
+                    del in_flight[key]
+                    try:
+                        outcome = future.result()
+                    except Exception as exc:
+                        outcome = exc
+                    finished[key] = outcome
+                    finish(outcome, indices)
         
+        self._log_cache_counts()
         return results
     
-    def evaluate_batch_chunked(self, data_points: List[TaskDetectionDataPoint], chunk_size: Optional[int] = None) -> List[TaskDetectionResult]:
-        """Evaluate data points in smaller chunks to manage memory and server load."""
+    def _estimate_tokens(self, data_point: TaskDetectionDataPoint, use_summary: bool) -> int:
+        """Rough prompt length in tokens, at about four characters per token."""
+        try:
+            return len(self._build_prompt(data_point, use_summary)) // 4
+        except Exception:
+            # evaluate_batch reports the failure as this data point's error result
+            return 0
+    
+    def _checkpoint_fingerprint(self) -> str:
+        """
+        Fingerprint of everything that shapes a result besides the data point itself.
+        
+        Covers the response cache salt (model and generation settings), both prompt
+        templates, the schema and use_summary, so a checkpoint written before any of
+        them changed is not resumed.
+        """
+        use_summary = self.config.get('evaluation', {}).get('task_detection', {}).get('use_summary', True)
+        templates = [
+            self.prompt_manager.get_prompt_info('task-detection', name)
+            for name in ('detect_tasks', 'detect_tasks_no_summary')
+        ]
+        digest = hashlib.sha256(self._response_cache_salt)
+        digest.update(b'\0' + json.dumps([templates, use_summary], sort_keys=True, default=str).encode())
+        digest.update(b'\0' + hashlib.sha256((self._schema or '').encode()).digest())
+        return digest.hexdigest()
+    
+    def load_checkpoint(self, checkpoint_path: str, fingerprint: str) -> Optional[Dict[str, TaskDetectionResult]]:
+        """
+        Load successful results recorded in a JSONL checkpoint, keyed by data point filename.
+        
+        The first line of a checkpoint holds the fingerprint it was written under. Returns
+        None when there is no checkpoint, or when its fingerprint doesn't match and it is stale.
+        """
+        done = {}
+        try:
+            with open(checkpoint_path, 'rb') as f:
+                header = f.readline()
+                if not header:
+                    return None
+                try:
+                    header = load_json_bytes(header)
+                except ValueError:
+                    header = None
+                if not isinstance(header, dict) or header.get('fingerprint') != fingerprint:
+                    logger.warning(f"Discarding checkpoint {checkpoint_path}: it was written with different "
+                                   f"prompts, schema, model or generation settings")
+                    return None
+                for line in f:
+                    try:
+                        result = TaskDetectionResult(**load_json_bytes(line))
+                    except (ValueError, TypeError):
+                        # A run killed mid-write can leave a truncated last line
+                        continue
+                    # Failed requests leave no raw response; leave those to be retried
+                    if result.raw_response:
+                        done[result.filename] = result
+        except FileNotFoundError:
+            return None
+        return done
+    
+    def evaluate_batch_chunked(self, data_points: List[TaskDetectionDataPoint], chunk_size: Optional[int] = None,
+                               checkpoint_path: Optional[str] = None) -> List[TaskDetectionResult]:
+        """
+        Evaluate data points in smaller chunks to manage memory and server load.
+        
+        Data points are chunked in order of prompt length. Each chunk waits on its
+        slowest request, so grouping similar lengths keeps short prompts from idling
+        behind long ones.
+        
+        With a checkpoint_path, each result is appended there as JSONL as it finishes and
+        data points already recorded in it are skipped, so an interrupted run picks up where
+        it stopped. A checkpoint written under other prompts, schema or model settings is
+        discarded instead. Results are returned in data_points order either way.
+        """
         if chunk_size is None:
             # Use batch_size from parallel config
             parallel_config = self.get_parallel_config()
             chunk_size = parallel_config['batch_size']
         
+        all_data_points = data_points
+        done = {}
+        checkpoint = None
+        if checkpoint_path:
+            fingerprint = self._checkpoint_fingerprint()
+            done = self.load_checkpoint(checkpoint_path, fingerprint)
+            os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+            if done is None:
+                # No usable checkpoint, so start a new one under the current fingerprint
+                done = {}
+                checkpoint = open(checkpoint_path, 'w', encoding='utf-8')
+                checkpoint.write(dump_json_str({'fingerprint': fingerprint}) + '\n')
+                checkpoint.flush()
+            else:
+                if done:
+                    data_points = [dp for dp in data_points if dp.filename not in done]
+                    logger.info(f"Resuming from checkpoint: {len(done)} data points already evaluated")
+                checkpoint = open(checkpoint_path, 'a', encoding='utf-8')
+                # Start on a fresh line if the last run died partway through a record
+                with open(checkpoint_path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        checkpoint.write('\n')
+        
+        if len(data_points) > chunk_size:
+            use_summary = self.config.get('evaluation', {}).get('task_detection', {}).get('use_summary', True)
+            order = sorted(range(len(data_points)), key=lambda i: self._estimate_tokens(data_points[i], use_summary))
+        else:
+            # A single chunk has no boundaries to balance, so skip rendering prompts just to sort
+            order = range(len(data_points))
+        
+        try:
+            sorted_results = self._evaluate_chunks([data_points[i] for i in order], chunk_size, checkpoint)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        
+        new_results = [None] * len(data_points)
+        for i, result in zip(order, sorted_results):
+            new_results[i] = result
+        
+        if not done:
+            return new_results
+        done.update((result.filename, result) for result in new_results)
+        return [done[dp.filename] for dp in all_data_points]
+    
+    def _evaluate_chunks(self, data_points: List[TaskDetectionDataPoint], chunk_size: int, checkpoint=None) -> List[TaskDetectionResult]:
+        """Evaluate data points chunk by chunk, appending results to checkpoint if given."""
         all_results = []
         total_chunks = (len(data_points) + chunk_size - 1) // chunk_size
         
@@ -258,12 +571,8 @@ class TaskDetectionEvaluator:
         for i in tqdm(range(0, len(data_points), chunk_size), 
                      desc="Processing chunks", unit="chunk", total=total_chunks):
             chunk = data_points[i:i + chunk_size]
-            chunk_results = self.evaluate_batch(chunk)
+            chunk_results = self.evaluate_batch(chunk, checkpoint)
             all_results.extend(chunk_results)
-            
-            # Optional: Add a small delay between chunks to prevent overwhelming the server
-            if i + chunk_size < len(data_points):
-                time.sleep(0.1)
         
         return all_results
     
@@ -273,9 +582,17 @@ class TaskDetectionEvaluator:
             return {}
         
         parallel_config = self.get_parallel_config()
-        total_time = sum(r.response_time for r in results)
+        # Total and slowest response time in a single pass. Cached results carry the
+        # timings of an earlier run, so only requests made in this run count.
+        total_time = 0.0
+        parallel_time_estimate = 0.0
+        for r in results:
+            if r.cached:
+                continue
+            total_time += r.response_time
+            if r.response_time > parallel_time_estimate:
+                parallel_time_estimate = r.response_time
         sequential_time_estimate = total_time  # If run sequentially
-        parallel_time_estimate = max(r.response_time for r in results) if results else 0
         
         return {
             'parallel_config': parallel_config,
@@ -292,13 +609,30 @@ class TaskDetectionEvaluator:
             return {}
         
         total_data_points = len(results)
-        successful_detections = sum(1 for r in results if r.correct)
+        
+        # Accumulate every metric in one pass over the results. Timings of cached
+        # results come from an earlier run, so they are left out of the timing averages.
+        successful_detections = 0
+        total_tokens = 0
+        cached_responses = 0
+        total_response_time = 0.0
+        total_tokens_per_second = 0.0
+        for r in results:
+            successful_detections += r.correct
+            total_tokens += r.tokens_generated
+            if r.cached:
+                cached_responses += 1
+                continue
+            total_response_time += r.response_time
+            total_tokens_per_second += r.tokens_per_second
+        timed = total_data_points - cached_responses
         
         return {
             'total_data_points': total_data_points,
             'successful_detections': successful_detections,
-            'success_rate': successful_detections / total_data_points if total_data_points > 0 else 0,
-            'averate_tokens_generated': sum(r.tokens_generated for r in results) / total_data_points if total_data_points > 0 else 0,
-            'average_response_time': sum(r.response_time for r in results) / total_data_points if total_data_points > 0 else 0,
-            'average_tokens_per_second': sum(r.tokens_per_second for r in results) / total_data_points if total_data_points > 0 else 0,
+            'success_rate': successful_detections / total_data_points,
+            'averate_tokens_generated': total_tokens / total_data_points,
+            'cached_responses': cached_responses,
+            'average_response_time': total_response_time / timed if timed else 0.0,
+            'average_tokens_per_second': total_tokens_per_second / timed if timed else 0.0,
         }
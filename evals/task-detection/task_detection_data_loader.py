@@ -5,20 +5,43 @@ import json
 import sys
 import os
 from typing import List, Dict, Any, Optional, Iterator, TypeVar, Generic, Type
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
 # Add parent directory to path to import common modules
 parent_dir = os.path.join(os.path.dirname(__file__), '..', 'common')
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from data_loader import BaseDataLoader, BaseEvalDataPoint
+from data_loader import BaseDataLoader, BaseEvalDataPoint, load_json_bytes, dump_json_str
 
 logger = logging.getLogger(__name__)
 
+if msgspec is not None:
+    class _TaskDetectionRecord(msgspec.Struct):
+        """On-disk layout of a task detection eval file."""
+        timestamp: str
+        ground_truth_completed_step_ids: list
+        prev_prev_screen_state: dict
+        prev_prev_summary: Optional[str]
+        prev_screen_state: dict
+        screen_diff_markdown: str | dict
+        active_tasks: list
+        formatted_tasks: str | list
+        formatted_screen_state: str
+
+    # Parses and validates the file straight into a struct in one C-level pass
+    _record_decoder = msgspec.json.Decoder(_TaskDetectionRecord)
+else:
+    _record_decoder = None
+
 
-@dataclass
+@dataclass(slots=True)
 class TaskDetectionDataPoint(BaseEvalDataPoint):
     """Task detection specific data point with additional methods."""
     prev_prev_state: Dict[str, Any]
@@ -28,6 +51,9 @@ class TaskDetectionDataPoint(BaseEvalDataPoint):
     active_tasks: List[Dict[str, Any]]
     formatted_tasks: List[Dict[str, Any]]
     formatted_screen_state: str
+    _tasks_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _ground_truth_set: Optional[frozenset] = field(default=None, init=False, repr=False, compare=False)
+    _screen_applications: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'TaskDetectionDataPoint':
@@ -50,23 +76,60 @@ class TaskDetectionDataPoint(BaseEvalDataPoint):
             raise ValueError(f"Invalid data point format: {e}")
         return obj
     
+    @classmethod
+    def from_json(cls, raw: bytes) -> 'TaskDetectionDataPoint':
+        """Create TaskDetectionDataPoint from raw JSON bytes."""
+        if _record_decoder is None:
+            return cls.from_dict(load_json_bytes(raw))
+        try:
+            record = _record_decoder.decode(raw)
+        except msgspec.ValidationError as e:
+            raise ValueError(f"Invalid data point format: {e}")
+        return cls(
+            filename="",  # Placeholder for filename, will be set later
+            timestamp=record.timestamp,
+            ground_truth=record.ground_truth_completed_step_ids,
+            prev_prev_state=record.prev_prev_screen_state,
+            prev_prev_summary=record.prev_prev_summary,
+            prev_state=record.prev_screen_state,
+            screen_diff=record.screen_diff_markdown,
+            active_tasks=record.active_tasks,
+            formatted_tasks=record.formatted_tasks,
+            formatted_screen_state=record.formatted_screen_state
+        )
+    
+    def tasks_json(self) -> str:
+        """Get the tasks as prompt text, serializing structured tasks once per data point."""
+        if self._tasks_json is None:
+            tasks = self.formatted_tasks
+            # Compact output: indentation only adds prompt tokens the model doesn't need
+            self._tasks_json = tasks if isinstance(tasks, str) else dump_json_str(tasks)
+        return self._tasks_json
+    
+    def ground_truth_set(self) -> frozenset:
+        """Get the ground truth step ids as a set, built once per data point."""
+        if self._ground_truth_set is None:
+            self._ground_truth_set = frozenset(self.ground_truth)
+        return self._ground_truth_set
+    
     def get_screen_applications(self) -> List[str]:
-        """Get list of applications present in the current state."""
-        apps = []
-        if self.current_state and 'data' in self.current_state:
-            for item in self.current_state['data']:
-                app_name = item.get('application_name')
-                if app_name and app_name not in apps:
-                    apps.append(app_name)
-        return apps
+        """Get list of applications present in the most recent screen state."""
+        if self._screen_applications is None:
+            state = self.prev_state or {}
+            # dict.fromkeys de-duplicates in C while keeping first-seen order
+            self._screen_applications = tuple(dict.fromkeys(
+                app_name for item in state.get('data', ()) if (app_name := item.get('application_name'))
+            ))
+        # Hand out a fresh list so callers can't modify the cached names
+        return list(self._screen_applications)
 
 
 class TaskDetectionDataLoader(BaseDataLoader[TaskDetectionDataPoint]):
     """Data loader specifically for task detection evaluation."""
     
-    def __init__(self, data_dir: str = "data", min_screen_text_length: int = 10):
+    def __init__(self, data_dir: str = "data", min_screen_text_length: int = 10, use_cache: bool = True):
         """Initialize task detection data loader."""
-        super().__init__(data_dir)
+        super().__init__(data_dir, use_cache)
         self.min_screen_text_length = min_screen_text_length
     
     def get_data_point_class(self) -> Type[TaskDetectionDataPoint]:
@@ -81,6 +144,11 @@ class TaskDetectionDataLoader(BaseDataLoader[TaskDetectionDataPoint]):
         """
         return True
     
+    def _extract_fields(self, data_point: TaskDetectionDataPoint) -> tuple:
+        """Pull the prompt fields shared by both prompt variants in one pass over the point."""
+        state = data_point.prev_state or {}
+        return state.get('active_url') or '', data_point.tasks_json()
+    
     def prepare_prompt_data(self, data_point: TaskDetectionDataPoint) -> Dict[str, Any]:
         """
         Prepare data point for task detection prompt generation.
@@ -88,11 +156,12 @@ class TaskDetectionDataLoader(BaseDataLoader[TaskDetectionDataPoint]):
         Returns:
             Dictionary with keys: previous_summary, text, active_url, tasks
         """
+        active_url, tasks = self._extract_fields(data_point)
         return {
             'previous_summary': data_point.prev_prev_summary or "No previous summary available",
             'text': data_point.screen_diff,
-            'active_url': data_point.prev_state.get('active_url', ''),
-            'tasks': data_point.formatted_tasks
+            'active_url': active_url,
+            'tasks': tasks
         }
     
     def prepare_prompt_data_no_summary(self, data_point: TaskDetectionDataPoint) -> Dict[str, Any]:
@@ -102,10 +171,11 @@ class TaskDetectionDataLoader(BaseDataLoader[TaskDetectionDataPoint]):
         Returns:
             Dictionary with keys: text, active_url, tasks
         """
+        active_url, tasks = self._extract_fields(data_point)
         return {
             'text': data_point.formatted_screen_state,
-            'active_url': data_point.prev_state.get('active_url', ''),
-            'tasks': data_point.formatted_tasks
+            'active_url': active_url,
+            'tasks': tasks
         }
     
     def get_evaluation_schema_key(self) -> str:
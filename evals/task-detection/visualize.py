@@ -9,6 +9,11 @@ import numpy as np
 from typing import Dict, Any, List, Optional
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 class EvalVisualizer:
@@ -21,6 +26,9 @@ class EvalVisualizer:
     
     def load_results(self, results_path: str) -> Dict[str, Any]:
         """Load evaluation results from JSON file."""
+        if orjson is not None:
+            with open(results_path, 'rb') as f:
+                return orjson.loads(f.read())
         with open(results_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     
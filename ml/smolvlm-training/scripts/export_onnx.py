@@ -0,0 +1,55 @@
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+def export_onnx(model_name, output_path, input_path=None, execution_provider="cpu"):
+    # Build an ONNX Runtime GenAI model with INT4 weights. Accuracy level 4 selects the
+    # int8 activation x int4 weight matmul kernels, which dominate decode time on CPU.
+    cmd = [
+        sys.executable, "-m", "onnxruntime_genai.models.builder",
+        "-m", model_name,
+        "-o", output_path,
+        "-p", "int4",
+        "-e", execution_provider,
+        "--extra_options", "int4_accuracy_level=4",
+    ]
+    # Export local (e.g. merged fine-tuned) weights instead of downloading model_name
+    if input_path:
+        cmd += ["-i", input_path]
+    print(f"Running: {' '.join(cmd)}")
+    subprocess.run(cmd, check=True)
+    print(f"ONNX model saved to {output_path}")
+
+def quantize_vision_int8(output_path):
+    # The vision encoder tolerates plain round-to-nearest INT8 weights well, unlike the
+    # decoder which needs the INT4 builder path above, so quantize it separately
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        sys.exit("INT8 vision quantization needs onnxruntime (pip install onnxruntime), or pass --no_vision_int8")
+
+    vision_models = glob.glob(os.path.join(output_path, "*vision*.onnx"))
+    if not vision_models:
+        sys.exit(f"No vision encoder found in {output_path} to quantize to INT8; pass --no_vision_int8 to skip it")
+    for model_path in vision_models:
+        tmp_path = model_path + ".int8.tmp"
+        quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, model_path)
+        print(f"Quantized vision encoder to INT8: {model_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a SmolVLM model to ONNX Runtime GenAI with an INT4 decoder and INT8 vision encoder.")
+    parser.add_argument("--model_name", type=str, default="HuggingFaceTB/SmolVLM2-500M-Video-Instruct", help="HuggingFace model id of the base architecture")
+    parser.add_argument("--input_path", type=str, default=None, help="Optional path to local weights to export")
+    parser.add_argument("--output_path", type=str, required=True, help="Path to save the ONNX model")
+    parser.add_argument("--execution_provider", type=str, default="cpu", help="Target execution provider (cpu, cuda, dml)")
+    parser.add_argument("--no_vision_int8", action="store_true", help="Leave the vision encoder unquantized")
+    args = parser.parse_args()
+    export_onnx(args.model_name, args.output_path, args.input_path, args.execution_provider)
+    if not args.no_vision_int8:
+        quantize_vision_int8(args.output_path)
+
+if __name__ == "__main__":
+    main()